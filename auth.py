@@ -6,20 +6,34 @@ Endpoints
 POST /auth/register  – create a new account, return JWT
 POST /auth/login     – verify credentials, return JWT
 GET  /auth/me        – return current user's profile
+
+Dependencies
+------------
+get_current_claims / get_current_active_user – JWT claims only, no DB
+get_current_user_db / require_admin – the (cached) User row; honour token_version
 """
 
+import asyncio
+import hashlib
 import os
-from datetime import datetime, timedelta, timezone
+import threading
+import time
+from hmac import compare_digest
 from typing import Optional
 
+from cachetools import TTLCache
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 import bcrypt
 
+import auth_writer
 import models
 from database import get_session
 
@@ -28,14 +42,32 @@ from database import get_session
 # ---------------------------------------------------------------------------
 
 SECRET_KEY: str = os.getenv("JWT_SECRET", "CHANGE_THIS_SECRET_IN_PRODUCTION")
+_SIGNING_KEY: bytes = SECRET_KEY.encode()
 ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60 * 24 * 7))
+# bcrypt work factor; each +1 doubles the cost of every login.  10 keeps
+# /auth/login fast on small cloud CPUs while staying within OWASP guidance.
+BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 10))
 
 pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# Decoded JWT payloads keyed by sha256(token), so repeat requests with the same
+# bearer token skip the HMAC verify + JSON parse.  The TTL is kept well below
+# any sensible token lifetime and `exp` is re-checked on every hit.
+_payload_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+# User rows keyed by email.  Detached dicts rather than ORM instances so a
+# cached entry is never bound to the session that loaded it.
+_user_cache: TTLCache = TTLCache(maxsize=5_000, ttl=60)
+_USER_CACHE_FIELDS = (
+    "id", "email", "full_name", "phone", "is_active", "is_admin", "token_version",
+)
+
+_cache_lock = threading.Lock()
+
 
 # ---------------------------------------------------------------------------
 # Pydantic schemas (kept here so they stay close to the auth logic)
@@ -64,6 +96,15 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+class TokenClaims(BaseModel):
+    """Identity and role flags carried inside a signed access token."""
+    id: int
+    email: str
+    is_admin: bool = False
+    is_active: bool = True
+    token_version: int = 0
+
+
 # ---------------------------------------------------------------------------
 # Utility functions
 # ---------------------------------------------------------------------------
@@ -76,66 +117,164 @@ def verify_password(plain: str, hashed: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     # Manual bcrypt hashing to bypass passlib bug
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (
-        expires_delta or timedelta(minutes=15)
-    )
-    to_encode["exp"] = expire
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+def password_needs_rehash(hashed: str) -> bool:
+    """True when a stored hash was made with a different bcrypt cost than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def safe_str_eq(a: str, b: str) -> bool:
+    """Constant-time string comparison; use for anything secret-bearing."""
+    return compare_digest(a.encode(), b.encode())
+
+
+def create_access_token(
+    user: models.User, ttl_seconds: int = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+) -> str:
+    payload = {
+        "sub": user.email,
+        "user_id": user.id,
+        "is_admin": user.is_admin,
+        "is_active": user.is_active,
+        "token_version": user.token_version,
+        "token_type": "access",
+        "exp": int(time.time()) + ttl_seconds,
+    }
+    return jwt.encode(payload, _SIGNING_KEY, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str) -> dict:
+    """Return the verified JWT payload, served from the TTL cache when possible."""
+    key = hashlib.sha256(token.encode()).digest()
+    with _cache_lock:
+        payload = _payload_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+    try:
+        payload = jwt.decode(token, _SIGNING_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        with _cache_lock:
+            _payload_cache.pop(key, None)
+        raise
+    with _cache_lock:
+        _payload_cache[key] = payload
+    return payload
+
+
+def invalidate_user(email: str) -> None:
+    """Drop a cached user row; call after any write that changes the account."""
+    with _cache_lock:
+        _user_cache.pop(email, None)
+
+
+async def _get_user_by_email(email: str, session: AsyncSession) -> Optional[models.User]:
+    with _cache_lock:
+        cached = _user_cache.get(email)
+    if cached is not None:
+        return models.User(**cached)
+    user = (await session.exec(
+        select(models.User).where(models.User.email == email).limit(1)
+    )).one_or_none()
+    if user is not None:
+        with _cache_lock:
+            _user_cache[email] = {f: getattr(user, f) for f in _USER_CACHE_FIELDS}
+    return user
 
 
 # ---------------------------------------------------------------------------
-# FastAPI dependency: current authenticated user
+# FastAPI dependencies: current authenticated user
 # ---------------------------------------------------------------------------
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
-) -> models.User:
-    """Decode JWT, look up the user, and return it (or raise 401)."""
-    credentials_exc = HTTPException(
+def _credentials_exc() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+async def get_current_claims(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+    """
+    Verify the JWT and return its claims (or raise 401).
+
+    The signed token carries the user id and role flags, so this never touches
+    the DB.  Tokens issued before those claims existed are rejected; the
+    client simply logs in again.
+    """
+    # Cheap shape check so scanner junk never reaches the hash/HMAC path
+    if token.count(".") != 2 or not (20 < len(token) < 4096):
+        raise _credentials_exc()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: Optional[str] = payload.get("sub")
-        if email is None:
-            raise credentials_exc
+        payload = decode_access_token(token)
     except JWTError:
-        raise credentials_exc
+        raise _credentials_exc()
+    email: Optional[str] = payload.get("sub")
+    if email is None or "is_admin" not in payload:
+        raise _credentials_exc()
+    # Tokens issued before the claim existed carry no token_type
+    token_type = payload.get("token_type")
+    if token_type is not None and not safe_str_eq(str(token_type), "access"):
+        raise _credentials_exc()
+    return TokenClaims(
+        id=payload["user_id"],
+        email=email,
+        is_admin=payload["is_admin"],
+        is_active=payload.get("is_active", True),
+        token_version=payload.get("token_version", 0),
+    )
+
 
-    user = session.exec(
-        select(models.User).where(models.User.email == email)
-    ).first()
-    if user is None:
-        raise credentials_exc
+async def get_current_user_db(
+    claims: TokenClaims = Depends(get_current_claims),
+    session: AsyncSession = Depends(get_session),
+) -> models.User:
+    """
+    Load the user row behind the token, for routes where a revoked token or a
+    stale role must not be honoured (/auth/me and every admin route).
+
+    Rejects tokens whose token_version no longer matches the row, which is how
+    outstanding tokens are revoked after a sensitive account change.  The row
+    comes from the 60 s user cache, so a revocation takes effect on the next
+    cache miss – immediately on the worker that called invalidate_user().
+    """
+    user = await _get_user_by_email(claims.email, session)
+    if user is None or user.token_version != claims.token_version:
+        raise _credentials_exc()
     return user
 
 
-def get_current_active_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+async def get_current_active_user(
+    current_user: TokenClaims = Depends(get_current_claims),
+) -> TokenClaims:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user account")
     return current_user
 
 
-def require_admin(
-    current_user: models.User = Depends(get_current_active_user),
-) -> models.User:
-    if not current_user.is_admin:
+async def require_admin(
+    user: models.User = Depends(get_current_user_db),
+) -> TokenClaims:
+    """Admin check against the current row, not the token's is_admin claim."""
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user account")
+    if not user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
         )
-    return current_user
+    return TokenClaims(
+        id=user.id,
+        email=user.email,
+        is_admin=user.is_admin,
+        is_active=user.is_active,
+        token_version=user.token_version,
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -143,36 +282,47 @@ def require_admin(
 # ---------------------------------------------------------------------------
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(user_in: UserCreate, session: Session = Depends(get_session)) -> Token:
+async def register(
+    user_in: UserCreate, session: AsyncSession = Depends(get_session)
+) -> Token:
     """Register a new user and return a JWT so they are immediately logged in."""
-    existing = session.exec(
-        select(models.User).where(models.User.email == user_in.email)
-    ).first()
+    existing = (await session.exec(
+        select(models.User).where(models.User.email == user_in.email).limit(1)
+    )).one_or_none()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="An account with this email already exists",
         )
+    # Hand the pooled connection back before hashing and queueing; the
+    # writer needs one of its own to commit the batch.
+    await session.close()
+    # bcrypt is CPU-bound; run it off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, user_in.password)
     db_user = models.User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         full_name=user_in.full_name,
         phone=user_in.phone,
     )
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    token = create_access_token(
-        {"sub": db_user.email, "user_id": db_user.id},
-        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
+    try:
+        # Inserts are coalesced with concurrent signups into one transaction
+        db_user = await auth_writer.submit(db_user)
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="An account with this email already exists",
+        )
+    invalidate_user(db_user.email)
+    token = create_access_token(db_user)
     return Token(access_token=token)
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ) -> Token:
     """
     Authenticate with email (username field) + password.
@@ -180,10 +330,12 @@ def login(
     Uses OAuth2PasswordRequestForm so the Swagger UI /docs 'Authorize' button
     works out of the box.
     """
-    user = session.exec(
-        select(models.User).where(models.User.email == form_data.username)
-    ).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = (await session.exec(
+        select(models.User).where(models.User.email == form_data.username).limit(1)
+    )).one_or_none()
+    if not user or not await asyncio.to_thread(
+        verify_password, form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -191,23 +343,36 @@ def login(
         )
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user account")
-    token = create_access_token(
-        {"sub": user.email, "user_id": user.id},
-        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
+    if password_needs_rehash(user.hashed_password):
+        # Migrate old cost-12 hashes so later logins pay the cheaper verify
+        user.hashed_password = await asyncio.to_thread(get_password_hash, form_data.password)
+        session.add(user)
+        await session.commit()
+    token = create_access_token(user)
     return Token(access_token=token)
 
 
-@router.get("/me", response_model=UserPublic)
-def get_me(current_user: models.User = Depends(get_current_active_user)) -> models.User:
+# response_model=None skips re-validating trusted server-side data; the
+# schema is still documented through `responses`.
+@router.get("/me", response_model=None, responses={200: {"model": UserPublic}})
+async def get_me(current_user: models.User = Depends(get_current_user_db)) -> UserPublic:
     """Return the currently authenticated user's profile."""
-    return current_user
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user account")
+    return UserPublic.model_construct(
+        id=current_user.id,
+        email=current_user.email,
+        full_name=current_user.full_name,
+        phone=current_user.phone,
+        is_admin=current_user.is_admin,
+        is_active=current_user.is_active,
+    )
 
 
 @router.get("/users/all", response_model=list[UserPublic])
-def list_all_users(
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
+async def list_all_users(
+    session: AsyncSession = Depends(get_session),
+    _admin: TokenClaims = Depends(require_admin),
 ) -> list[models.User]:
     """Return all registered users. Admin only."""
-    return session.exec(select(models.User).order_by(models.User.created_at.desc())).all()
+    return (await session.exec(select(models.User).order_by(models.User.created_at.desc()))).all()
@@ -0,0 +1,70 @@
+"""
+Request-coalescing writer for new user accounts.
+
+Signups are handed to a single background task which inserts everything that
+has queued up (up to MAX_BATCH rows) in one transaction, so a burst of
+registrations costs one commit per batch instead of one per request.
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import models
+from database import async_engine
+
+MAX_BATCH = 100
+
+_Item = Tuple[models.User, "asyncio.Future[models.User]"]
+
+_queue: Optional["asyncio.Queue[_Item]"] = None
+_worker: Optional["asyncio.Task[None]"] = None
+
+
+async def submit(user: models.User) -> models.User:
+    """
+    Queue a new user for insertion and wait until its batch has committed.
+
+    Returns the same instance with `id` populated.  Database errors (e.g. an
+    IntegrityError from a duplicate email) are re-raised to the caller.
+    """
+    global _queue, _worker
+    loop = asyncio.get_running_loop()
+    if _worker is None or _worker.done() or _worker.get_loop() is not loop:
+        _queue = asyncio.Queue()
+        _worker = loop.create_task(_run(_queue))
+    fut: "asyncio.Future[models.User]" = loop.create_future()
+    await _queue.put((user, fut))
+    return await fut
+
+
+async def _run(queue: "asyncio.Queue[_Item]") -> None:
+    while True:
+        batch: List[_Item] = [await queue.get()]
+        # Take whatever arrived while the previous batch was committing;
+        # an idle server never waits on a timer.
+        while len(batch) < MAX_BATCH and not queue.empty():
+            batch.append(queue.get_nowait())
+        await _flush(batch)
+
+
+async def _flush(batch: List[_Item]) -> None:
+    try:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            session.add_all([user for user, _ in batch])
+            await session.commit()
+    except Exception as exc:
+        if len(batch) > 1:
+            # One bad row fails the whole transaction; retry one by one so
+            # only the offending request sees the error.
+            for item in batch:
+                await _flush([item])
+            return
+        _, fut = batch[0]
+        if not fut.done():
+            fut.set_exception(exc)
+        return
+    for user, fut in batch:
+        if not fut.done():
+            fut.set_result(user)
@@ -0,0 +1,57 @@
+"""
+In-process caches for read-mostly catalog data.
+
+Results of the public product / review GET endpoints, and individual Product
+rows for read-only lookups, are cached per worker and dropped wholesale by
+`invalidate_catalog()` on any write that can change them (product CRUD,
+reviews, checkout stock deduction).  Other workers pick up a change once the
+short TTL lapses.
+"""
+
+import threading
+from typing import Any, Hashable, Optional
+
+from cachetools import TTLCache
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import models
+
+_caches = {
+    "product": TTLCache(maxsize=2_048, ttl=30),
+    "products": TTLCache(maxsize=1_024, ttl=60),
+    "search": TTLCache(maxsize=1_024, ttl=30),
+    "reviews": TTLCache(maxsize=1_024, ttl=60),
+}
+_lock = threading.Lock()
+
+
+def get(namespace: str, key: Hashable) -> Optional[Any]:
+    with _lock:
+        return _caches[namespace].get(key)
+
+
+def put(namespace: str, key: Hashable, value: Any) -> None:
+    with _lock:
+        _caches[namespace][key] = value
+
+
+async def get_product(session: AsyncSession, product_id: int) -> Optional[models.Product]:
+    """
+    `session.get(Product, id)` through the row cache.
+
+    Only for read-only checks – the instance may be shared with other
+    requests, so never modify it or use it for stock/rating writes.
+    """
+    prod = get("product", product_id)
+    if prod is None:
+        prod = await session.get(models.Product, product_id)
+        if prod is not None:
+            put("product", product_id, prod)
+    return prod
+
+
+def invalidate_catalog() -> None:
+    """Drop every cached catalog response."""
+    with _lock:
+        for c in _caches.values():
+            c.clear()
@@ -1,5 +1,11 @@
 import os
-from sqlmodel import create_engine, Session, SQLModel
+
+import orjson
+from sqlalchemy import delete, event, func, inspect, literal, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,18 +17,197 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # check_same_thread=False is required for SQLite when used with FastAPI's
-# async request handling (multiple threads may share one connection)
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# async request handling (multiple threads may share one connection);
+# cached_statements enlarges sqlite3's per-connection prepared-statement LRU
+# (default 128) so the app's and seed's statements all stay prepared.
+connect_args = (
+    {"check_same_thread": False, "cached_statements": 256} if "sqlite" in DATABASE_URL else {}
+)
+
+# SQLite keeps SQLAlchemy's default pool.  For Postgres, pre-ping drops sockets
+# the provider closed while idle, recycle stays under typical idle timeouts,
+# and LIFO keeps the most recently used (warm) connections in rotation.
+pool_kwargs = {} if "sqlite" in DATABASE_URL else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+    "pool_use_lifo": True,
+}
+
+# JSON/JSONB columns (product images, highlights, features) are encoded and
+# decoded with orjson instead of the stdlib json module.
+json_kwargs = {
+    "json_serializer": lambda o: orjson.dumps(o).decode(),
+    "json_deserializer": orjson.loads,
+}
+
+engine = create_engine(
+    DATABASE_URL, echo=False, connect_args=connect_args, **pool_kwargs, **json_kwargs
+)
+
+
+def _async_url(url: str) -> str:
+    """Swap the sync DBAPI driver for its asyncio counterpart (aiosqlite / asyncpg)."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    u = u.set(drivername=f"{backend}+{'aiosqlite' if backend == 'sqlite' else 'asyncpg'}")
+    # asyncpg takes `ssl`, not libpq's `sslmode`
+    if "sslmode" in u.query:
+        u = u.difference_update_query(["sslmode"]).update_query_dict({"ssl": u.query["sslmode"]})
+    return u.render_as_string(hide_password=False)
 
-engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
+
+# Used by request handlers; the sync `engine` above is for init_db() and
+# the seed script.
+async_engine = create_async_engine(
+    _async_url(DATABASE_URL), echo=False, connect_args=connect_args, **pool_kwargs, **json_kwargs
+)
+
+
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record) -> None:
+        # WAL lets readers proceed during a write, and NORMAL sync skips the
+        # per-commit fsync (still safe against corruption in WAL mode).
+        # busy_timeout makes a second writer (e.g. the seed script while the
+        # API is up) wait instead of failing with "database is locked"; the
+        # 64 MB page cache keeps bulk inserts and index builds in memory.
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=268435456")
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.execute("PRAGMA cache_size=-64000")
+        cur.close()
 
 
 def init_db() -> None:
     """Create all tables that are registered in SQLModel metadata."""
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _merge_duplicate_cart_items()
+    _ensure_indexes()
+    if engine.dialect.name == "postgresql":
+        _ensure_trigram_indexes()
+
+
+def _add_missing_columns() -> None:
+    """
+    ALTER existing tables to add columns declared on a model since they were created.
+
+    A lightweight stand-in for migrations: only additive changes, and the new
+    column gets its scalar default (if any) so existing rows stay valid.
+    """
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        preparer = conn.dialect.identifier_preparer
+        for table in SQLModel.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                ddl = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(col)} {col.type.compile(conn.dialect)}"
+                )
+                if col.default is not None and col.default.is_scalar:
+                    value = literal(col.default.arg).compile(
+                        dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+                    )
+                    ddl += f" NOT NULL DEFAULT {value}"
+                conn.exec_driver_sql(ddl)
+
+
+def _merge_duplicate_cart_items() -> None:
+    """
+    Fold duplicate (user_id, product_id) cart rows into one before the unique
+    ix_cart_user_product index is built.
+
+    Databases from before that index existed can hold duplicates (concurrent
+    adds used to race a SELECT against the INSERT).  Each group keeps its
+    lowest id with the quantities summed.  Skipped once the index exists.
+    """
+    cart = SQLModel.metadata.tables.get("cartitem")
+    if cart is None:   # models not imported – nothing to migrate
+        return
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        if not insp.has_table(cart.name) or "ix_cart_user_product" in {
+            ix["name"] for ix in insp.get_indexes(cart.name)
+        }:
+            return
+        dup = cart.alias("dup")
+        same_item = (dup.c.user_id == cart.c.user_id) & (dup.c.product_id == cart.c.product_id)
+        keep_ids = (
+            select(func.min(cart.c.id))
+            .group_by(cart.c.user_id, cart.c.product_id)
+        )
+        merged = conn.execute(
+            update(cart)
+            .where(cart.c.id.in_(keep_ids.having(func.count() > 1)))
+            .values(quantity=select(func.sum(dup.c.quantity)).where(same_item).scalar_subquery())
+        ).rowcount
+        if merged:
+            conn.execute(delete(cart).where(cart.c.id.not_in(keep_ids)))
+            print(f"⚠️ Merged duplicate cart rows for {merged} (user, product) pairs")
+
+
+def _ensure_indexes() -> None:
+    """
+    Create any declared index that is missing.
+
+    create_all() skips tables that already exist, so an index added to a model
+    later (or the unique ix_user_email on an older Postgres table) would never
+    be built without this.
+    """
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            # One transaction per index so a single failure doesn't block the
+            # rest.  Unique indexes are the exception: the cart upsert and the
+            # seed's user insert name them as their ON CONFLICT target and
+            # fail on every call without them, so refuse to start instead.
+            try:
+                with engine.begin() as conn:
+                    index.create(conn, checkfirst=True)
+            except Exception as e:
+                if index.unique:
+                    raise RuntimeError(f"Could not create unique index {index.name}") from e
+                print(f"⚠️ Could not create index {index.name}: {e}")
+
+
+def _ensure_trigram_indexes() -> None:
+    """
+    Postgres only: GIN trigram indexes so product search's `ILIKE '%term%'`
+    is an index probe instead of a sequential scan.
+
+    Kept out of the model metadata because SQLite would build them as plain
+    (useless) b-tree indexes.  Needs permission to create the pg_trgm
+    extension; if that fails search still works, just unindexed.
+    """
+    statements = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_product_description_trgm ON product USING gin (description gin_trgm_ops)",
+    ]
+    try:
+        with engine.begin() as conn:
+            for stmt in statements:
+                conn.exec_driver_sql(stmt)
+    except Exception as e:
+        print(f"⚠️ Could not create trigram search indexes: {e}")
+
 
+async def get_session():
+    """
+    FastAPI dependency that yields an AsyncSession per request.
 
-def get_session():
-    """FastAPI dependency that yields a DB session per request."""
-    with Session(engine) as session:
+    expire_on_commit=False so attributes stay readable after commit without
+    an implicit (and, under asyncio, illegal) lazy reload.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
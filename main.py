@@ -1,6 +1,7 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 load_dotenv()
 import database
@@ -10,37 +11,57 @@ from routers_products import router as products_router
 from routers_cart import router as cart_router
 from routers_orders import router as orders_router
 from routers_reviews import router as reviews_router
-app = FastAPI(title="Aurelia Jewels API")
-# --- THE FIX: This allows EVERY website (Vercel, Local, etc.) ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_db()
+    # Opt-in only: seeding on every boot slows cold starts and runs again on
+    # every autoscaled worker.  Otherwise seed once with `python -m scripts.seed`.
+    if os.getenv("RUN_SEED") == "1":
+        try:
+            from scripts.seed import seed
+            seed(reset=False)
+            print("✅ Database auto-seeded successfully!")
+        except Exception as e:
+            print(f"⚠️ Seeding skipped: {e}")
+    # Load the bcrypt and jose backends now so the first login doesn't pay for it
+    auth.get_password_hash("warmup")
+    auth.decode_access_token(auth.create_access_token(models.User(id=0, email="warmup")))
+    yield
+    await database.async_engine.dispose()
+app = FastAPI(
+    title="Aurelia Jewels API",
+    lifespan=lifespan,
+)
+# FRONTEND_URL may be a comma-separated list; local dev servers are always allowed.
+# A wildcard origin can't be combined with credentials, so origins are explicit.
+_origins = {o.strip() for o in os.getenv("FRONTEND_URL", "").split(",") if o.strip()}
+_origins |= {"http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:5173"}
+ALLOWED_ORIGINS = sorted(_origins)
 app.add_middleware(
     CORSMiddleware,
-    allow_origin_regex='https://.*\.vercel\.app', # This allows ANY vercel sub-domain
+    allow_origin_regex=r"https://.*\.vercel\.app",  # any Vercel (preview) deployment
     allow_credentials=True,
-    allow_origins=["*"], 
+    allow_origins=ALLOWED_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],  # pagination total on product listings
 )
 app.include_router(auth.router)
 app.include_router(products_router)
 app.include_router(cart_router)
 app.include_router(orders_router)
 app.include_router(reviews_router)
-@app.on_event("startup")
-def on_startup() -> None:
-    database.init_db()
-    # This automatically fills your database with products on Render
-    try:
-        from scripts.seed import seed
-        seed(reset=False)
-        print("✅ Database auto-seeded successfully!")
-    except Exception as e:
-        print(f"⚠️ Seeding skipped: {e}")
-@app.get("/")
-def home():
-    return {"status": "ok", "message": "Jewellery API is Live!"}
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+# Liveness probes hit these constantly, so they are bare Starlette routes
+# returning prebuilt bodies: no dependency injection, no serialization, and
+# async so Starlette runs them on the event loop instead of the threadpool.
+_HOME_RESP = Response(b'{"status":"ok","message":"Jewellery API is Live!"}', media_type="application/json")
+_HEALTH_RESP = Response(b'{"status":"ok"}', media_type="application/json")
+async def home(request: Request) -> Response:
+    return _HOME_RESP
+async def health(request: Request) -> Response:
+    return _HEALTH_RESP
+app.router.add_route("/", home, methods=["GET"], include_in_schema=False)
+app.router.add_route("/health", health, methods=["GET"], include_in_schema=False)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
\ No newline at end of file
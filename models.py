@@ -1,9 +1,13 @@
 from __future__ import annotations
 from typing import Optional, List
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime, timezone
 
+# JSONB on Postgres (stored pre-parsed, GIN-indexable); plain JSON elsewhere.
+JSONList = JSON().with_variant(JSONB(), "postgresql")
+
 
 # ---------------------------------------------------------------------------
 # Product
@@ -19,9 +23,9 @@ class ProductBase(SQLModel):
     sub: str | None = Field(default=None)                  # subcategory
     description: str | None = Field(default=None)
     image: str | None = Field(default=None)
-    images: list[str] | None = Field(default=None, sa_column=Column(JSON))
-    highlights: list[str] | None = Field(default=None, sa_column=Column(JSON))
-    features: list[str] | None = Field(default=None, sa_column=Column(JSON))
+    images: list[str] | None = Field(default=None, sa_column=Column(JSONList))
+    highlights: list[str] | None = Field(default=None, sa_column=Column(JSONList))
+    features: list[str] | None = Field(default=None, sa_column=Column(JSONList))
     rating: float = Field(default=0.0, ge=0, le=5)
     review_count: int = Field(default=0, ge=0)
     in_stock: bool = Field(default=True)
@@ -30,7 +34,19 @@ class ProductBase(SQLModel):
 
 
 class Product(ProductBase, table=True):
+    __table_args__ = (
+        Index("ix_product_category_sub", "category", "sub"),
+        Index("ix_product_is_featured", "is_featured"),
+        Index("ix_product_in_stock", "in_stock"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
+    # Bumped on every write (admin edits, checkout stock, review ratings);
+    # drives the ETag on the public product endpoints.  NULL on rows that
+    # predate the column.
+    updated_at: datetime | None = Field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
 
 
 class ProductCreate(ProductBase):
@@ -70,6 +86,7 @@ class User(SQLModel, table=True):
     phone: str | None = Field(default=None)
     is_active: bool = Field(default=True)
     is_admin: bool = Field(default=False)
+    token_version: int = Field(default=0)   # bump to revoke every outstanding JWT
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc)
     )
@@ -80,6 +97,12 @@ class User(SQLModel, table=True):
 # ---------------------------------------------------------------------------
 
 class Review(SQLModel, table=True):
+    # Serves a product's reviews in date order straight from the index
+    # (and plain product_id lookups via its leading column)
+    __table_args__ = (
+        Index("ix_review_product_created", "product_id", "created_at"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     product_id: int = Field(foreign_key="product.id")
@@ -100,16 +123,27 @@ class CartItemBase(SQLModel):
 
 
 class CartItem(CartItemBase, table=True):
+    # Also enforces one row per (user, product), which add_to_cart's upsert relies on
+    __table_args__ = (
+        Index("ix_cart_user_product", "user_id", "product_id", unique=True),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     product_id: int = Field(foreign_key="product.id")
 
 
 class CartItemCreate(CartItemBase):
-    """Schema for adding / updating cart items (client never sends user_id or id)."""
+    """Schema for adding cart items (client never sends user_id or id)."""
     pass
 
 
+class CartItemUpdate(SQLModel):
+    """Schema for setting a cart item's quantity; 0 removes the item."""
+    product_id: int | None = None   # accepted for older clients, ignored
+    quantity: int = Field(ge=0)
+
+
 # ---------------------------------------------------------------------------
 # Order
 # ---------------------------------------------------------------------------
@@ -123,6 +157,13 @@ class OrderItem(SQLModel, table=True):
 
 
 class Order(SQLModel, table=True):
+    # Serve "my orders, newest first" and the admin list without a sort
+    # (B-tree indexes are scanned backwards for DESC)
+    __table_args__ = (
+        Index("ix_order_user_created", "user_id", "created_at"),
+        Index("ix_order_created", "created_at"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     status: str = Field(default="pending")   # pending | confirmed | shipped | delivered | cancelled
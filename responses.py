@@ -0,0 +1,21 @@
+"""
+Response classes shared by the routers.
+
+ORJSONResponse is returned explicitly by the response_model=None endpoints
+that build plain dicts; everything else keeps FastAPI's default, which
+serialises response models through Pydantic's own fast path.  Defined here
+rather than imported from fastapi.responses, where it is deprecated in
+recent releases.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (several times faster than stdlib json)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -8,13 +8,19 @@ DELETE /cart/{item_id}  – remove a single item
 DELETE /cart/           – clear entire cart
 """
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+import cache
 import models
-from auth import get_current_active_user
+from responses import ORJSONResponse
+from auth import TokenClaims, get_current_active_user
 from database import get_session
 
 router = APIRouter(prefix="/cart", tags=["cart"])
@@ -24,13 +30,28 @@ router = APIRouter(prefix="/cart", tags=["cart"])
 # Helper: enrich cart items with product info for the response
 # ---------------------------------------------------------------------------
 
-def _enrich_cart(
-    items: List[models.CartItem], session: Session
+async def _enrich_cart(
+    items: List[models.CartItem], session: AsyncSession
 ) -> List[Dict[str, Any]]:
     """Return cart items with a nested `product` snapshot."""
+    # One IN query for every product instead of a SELECT per cart row, reading
+    # only the snapshot columns (not the wide JSON image/feature lists)
+    ids = {item.product_id for item in items}
+    prods = {
+        p.id: p
+        for p in (await session.exec(
+            select(
+                models.Product.id,
+                models.Product.name,
+                models.Product.price,
+                models.Product.image,
+                models.Product.in_stock,
+            ).where(models.Product.id.in_(ids))  # type: ignore[attr-defined]
+        )).all()
+    } if ids else {}
     enriched = []
     for item in items:
-        prod = session.get(models.Product, item.product_id)
+        prod = prods.get(item.product_id)
         enriched.append(
             {
                 "id": item.id,
@@ -55,23 +76,24 @@ def _enrich_cart(
 # Routes
 # ---------------------------------------------------------------------------
 
-@router.get("/")
-def get_cart(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
-) -> List[Dict[str, Any]]:
+@router.get("/", response_model=None)
+async def get_cart(
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
+) -> ORJSONResponse:
     """Return all cart items for the logged-in user, enriched with product details."""
-    items = session.exec(
+    items = (await session.exec(
         select(models.CartItem).where(models.CartItem.user_id == current_user.id)
-    ).all()
-    return _enrich_cart(items, session)
+    )).all()
+    # Hand-built dicts: render straight to JSON, skipping jsonable_encoder
+    return ORJSONResponse(await _enrich_cart(items, session))
 
 
 @router.post("/", response_model=models.CartItem, status_code=status.HTTP_201_CREATED)
-def add_to_cart(
+async def add_to_cart(
     item_in: models.CartItemCreate,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
 ) -> models.CartItem:
     """
     Add a product to the cart.
@@ -79,7 +101,7 @@ def add_to_cart(
     If the product already exists in the cart the quantities are merged
     (upsert behaviour) rather than creating a duplicate row.
     """
-    prod = session.get(models.Product, item_in.product_id)
+    prod = await cache.get_product(session, item_in.product_id)
     if not prod:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     if not prod.in_stock:
@@ -87,56 +109,55 @@ def add_to_cart(
     if prod.stock_quantity < item_in.quantity:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Only {prod.stock_quantity} items in stock")
 
-    # Upsert: merge if the item already exists for this user
-    existing = session.exec(
-        select(models.CartItem).where(
-            models.CartItem.user_id == current_user.id,
-            models.CartItem.product_id == item_in.product_id,
-        )
-    ).first()
-
-    if existing:
-        new_qty = existing.quantity + item_in.quantity
-        if prod.stock_quantity < new_qty:
-             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, 
-                detail=f"Cannot add {item_in.quantity}. Cart has {existing.quantity}, total would exceed stock ({prod.stock_quantity})."
-            )
-        existing.quantity = new_qty
-        session.add(existing)
-        session.commit()
-        session.refresh(existing)
-        return existing
-
-    new_item = models.CartItem(
+    # Atomic upsert: one INSERT ... ON CONFLICT DO UPDATE (backed by the unique
+    # ix_cart_user_product index) merges quantities without a SELECT first and
+    # without a race between concurrent adds.  The WHERE on the update branch
+    # is the stock guard, read from the product row itself rather than the
+    # cached copy above; when it fails no row comes back.  (A fresh insert is
+    # only checked against the cached stock – checkout re-checks it anyway.)
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(models.CartItem).values(
         user_id=current_user.id,
         product_id=item_in.product_id,
         quantity=item_in.quantity,
     )
-    session.add(new_item)
-    session.commit()
-    session.refresh(new_item)
-    return new_item
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "product_id"],
+        set_={"quantity": models.CartItem.quantity + stmt.excluded.quantity},
+        where=models.CartItem.quantity + item_in.quantity <= (
+            select(models.Product.stock_quantity)
+            .where(models.Product.id == item_in.product_id)
+            .scalar_subquery()
+        ),
+    ).returning(models.CartItem)
+    item = (await session.exec(stmt)).scalar_one_or_none()
+    if item is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot add {item_in.quantity}. Total in cart would exceed stock ({prod.stock_quantity}).",
+        )
+    await session.commit()
+    return item
 
 
 @router.put("/{item_id}", response_model=models.CartItem)
-def update_cart_item(
+async def update_cart_item(
     item_id: int,
-    item_in: models.CartItemCreate,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
-) -> models.CartItem:
+    item_in: models.CartItemUpdate,
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
+) -> Union[models.CartItem, Response]:
     """Set the exact quantity for a cart item.  Use quantity=0 to remove it."""
-    existing = session.get(models.CartItem, item_id)
+    existing = await session.get(models.CartItem, item_id)
     if not existing or existing.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
 
-    if item_in.quantity <= 0:
-        session.delete(existing)
-        session.commit()
-        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)   # item removed
+    if item_in.quantity == 0:
+        await session.delete(existing)
+        await session.commit()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)   # item removed
 
-    prod = session.get(models.Product, existing.product_id)
+    prod = await cache.get_product(session, existing.product_id)
     if not prod:
          # Should ideally delete the cart item if product is gone, but let's just error
         raise HTTPException(status_code=404, detail="Product associated with cart item not found")
@@ -149,34 +170,29 @@ def update_cart_item(
 
     existing.quantity = item_in.quantity
     session.add(existing)
-    session.commit()
-    session.refresh(existing)
+    await session.commit()
     return existing
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_cart_item(
+async def delete_cart_item(
     item_id: int,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
 ) -> None:
     """Remove a single item from the cart."""
-    existing = session.get(models.CartItem, item_id)
+    existing = await session.get(models.CartItem, item_id)
     if not existing or existing.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
-    session.delete(existing)
-    session.commit()
+    await session.delete(existing)
+    await session.commit()
 
 
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
-def clear_cart(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
+async def clear_cart(
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
 ) -> None:
     """Remove every item from the current user's cart."""
-    items = session.exec(
-        select(models.CartItem).where(models.CartItem.user_id == current_user.id)
-    ).all()
-    for item in items:
-        session.delete(item)
-    session.commit()
+    await session.exec(delete(models.CartItem).where(models.CartItem.user_id == current_user.id))
+    await session.commit()
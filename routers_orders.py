@@ -13,15 +13,23 @@ GET  /orders/admin/all                          – list every order
 PATCH /orders/admin/{order_id}/status           – update order status
 """
 
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlmodel import Session, select
+from sqlalchemy import and_, case, delete, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+import cache
 import models
-from auth import get_current_active_user, require_admin
-from database import get_session
+from responses import ORJSONResponse
+from auth import TokenClaims, get_current_active_user, require_admin
+from database import async_engine, get_session
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -29,39 +37,71 @@ router = APIRouter(prefix="/orders", tags=["orders"])
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
+# Routes return these hand-built dicts as ORJSONResponse directly so FastAPI
+# skips response-model validation and jsonable_encoder (orjson handles datetime).
+
+async def _order_details(
+    orders: List[models.Order], session: AsyncSession
+) -> List[Dict[str, Any]]:
+    """
+    Attach order-items (with product snapshots) and customer email to each order.
 
-def _order_detail(order: models.Order, session: Session) -> Dict[str, Any]:
-    """Attach order-items (with product snapshots) and customer email to an order dict."""
-    user = session.get(models.User, order.user_id)
-    items = session.exec(
-        select(models.OrderItem).where(models.OrderItem.order_id == order.id)
-    ).all()
-
-    items_out = []
-    for oi in items:
-        prod = session.get(models.Product, oi.product_id)
-        items_out.append(
+    Runs two queries regardless of how many orders/items there are: one for the
+    customers and one OrderItem ⟕ Product join for every item.
+    """
+    if not orders:
+        return []
+    order_ids = [o.id for o in orders]
+    user_ids = {o.user_id for o in orders}
+    users = {
+        u.id: u
+        for u in (await session.exec(
+            select(models.User.id, models.User.email, models.User.full_name)
+            .where(models.User.id.in_(user_ids))  # type: ignore[attr-defined]
+        )).all()
+    }
+    rows = (await session.exec(
+        select(models.OrderItem, models.Product.name, models.Product.image)
+        .outerjoin(models.Product, models.Product.id == models.OrderItem.product_id)
+        .where(models.OrderItem.order_id.in_(order_ids))  # type: ignore[attr-defined]
+        .order_by(models.OrderItem.id)
+    )).all()
+
+    items_by_order: Dict[int, List[Dict[str, Any]]] = {oid: [] for oid in order_ids}
+    for oi, product_name, product_image in rows:
+        items_by_order[oi.order_id].append(
             {
                 "id": oi.id,
                 "product_id": oi.product_id,
                 "quantity": oi.quantity,
                 "price": oi.price,
-                "product_name": prod.name if prod else None,
-                "product_image": prod.image if prod else None,
+                "product_name": product_name,
+                "product_image": product_image,
             }
         )
 
-    return {
-        "id": order.id,
-        "user_id": order.user_id,
-        "user_email": user.email if user else "Unknown",
-        "user_name": user.full_name if user else "Unknown",
-        "status": order.status,
-        "total": order.total,
-        "shipping_address": order.shipping_address,
-        "created_at": order.created_at,
-        "items": items_out,
-    }
+    out = []
+    for order in orders:
+        user = users.get(order.user_id)
+        out.append(
+            {
+                "id": order.id,
+                "user_id": order.user_id,
+                "user_email": user.email if user else "Unknown",
+                "user_name": user.full_name if user else "Unknown",
+                "status": order.status,
+                "total": order.total,
+                "shipping_address": order.shipping_address,
+                "created_at": order.created_at,
+                "items": items_by_order[order.id],
+            }
+        )
+    return out
+
+
+async def _order_detail(order: models.Order, session: AsyncSession) -> Dict[str, Any]:
+    """Single-order form of `_order_details`."""
+    return (await _order_details([order], session))[0]
 
 
 class StatusUpdate(BaseModel):
@@ -79,12 +119,12 @@ class OrderCreate(BaseModel):
     shipping_address: str | None = Field(default=None)
 
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
-def create_order(
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=None)
+async def create_order(
     order_in: OrderCreate,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
-) -> Dict[str, Any]:
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
+) -> ORJSONResponse:
     """
     Convert the authenticated user's cart into a new order.
 
@@ -92,126 +132,184 @@ def create_order(
     * Cart is cleared after a successful checkout.
     * Products that no longer exist in the DB are skipped.
     """
-    cart_items = session.exec(
+    cart_items = (await session.exec(
         select(models.CartItem).where(models.CartItem.user_id == current_user.id)
-    ).all()
+    )).all()
 
     if not cart_items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty"
         )
 
+    # Lock every product in the cart until commit so two concurrent checkouts
+    # can't both pass the stock check and oversell.  SQLite has no FOR UPDATE
+    # and this read runs before its write transaction starts, so the values
+    # here may be stale there – the guarded UPDATE below is what enforces it.
+    prods = {
+        p.id: p
+        for p in (await session.exec(
+            select(models.Product)
+            .where(models.Product.id.in_({ci.product_id for ci in cart_items}))  # type: ignore[attr-defined]
+            .with_for_update()
+        )).all()
+    }
+
     order = models.Order(
         user_id=current_user.id,
         shipping_address=order_in.shipping_address
     )
     session.add(order)
-    session.commit()
-    session.refresh(order)
+    await session.flush()   # assigns order.id; everything below commits together
 
     total = 0.0
+    item_rows = []
+    deltas: Dict[int, int] = {}
     for ci in cart_items:
-        prod = session.get(models.Product, ci.product_id)
+        prod = prods.get(ci.product_id)
         if not prod:
-            session.delete(ci) # Cleanup invalid cart item
-            continue  # product deleted since it was added to cart – skip it
-            
-        # Check stock
+            continue  # product deleted since it was added to cart – skip it (row cleared below)
+
+        # Check stock (raising here rolls back the whole checkout, order included)
         if prod.stock_quantity < ci.quantity:
              raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, 
                 detail=f"Insufficient stock for product '{prod.name}'. Available: {prod.stock_quantity}, Requested: {ci.quantity}"
             )
 
-        # Deduct stock
-        prod.stock_quantity -= ci.quantity
-        if prod.stock_quantity == 0:
-            prod.in_stock = False
-        session.add(prod)
-
-        oi = models.OrderItem(
-            order_id=order.id,
-            product_id=prod.id,
-            quantity=ci.quantity,
-            price=prod.price,
-        )
+        deltas[prod.id] = ci.quantity
+        item_rows.append({
+            "order_id": order.id,
+            "product_id": prod.id,
+            "quantity": ci.quantity,
+            "price": prod.price,
+        })
         total += prod.price * ci.quantity
-        session.add(oi)
-        session.delete(ci)   # clear cart item
+
+    # Deduct stock for every product in one UPDATE ... CASE instead of one per
+    # row.  The stock check is repeated inside the UPDATE against the current
+    # row, so a product that sold out concurrently simply isn't updated; any
+    # row short means the checkout fails and rolls back as a whole.
+    if deltas:
+        qty = case(
+            *((models.Product.id == pid, q) for pid, q in deltas.items()), else_=0
+        )
+        result = await session.exec(
+            update(models.Product)
+            .where(models.Product.id.in_(deltas))  # type: ignore[attr-defined]
+            .where(models.Product.stock_quantity >= qty)
+            .values(
+                stock_quantity=models.Product.stock_quantity - qty,
+                # Only ever clears the flag – never re-lists a product an admin hid
+                in_stock=and_(models.Product.in_stock, models.Product.stock_quantity - qty > 0),
+                updated_at=datetime.now(timezone.utc),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(deltas):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Insufficient stock for one or more items in your cart",
+            )
+
+    # All order lines in one executemany instead of an INSERT per item
+    if item_rows:
+        await session.exec(insert(models.OrderItem), params=item_rows)
+
+    # Clear the whole cart (including rows for vanished products) in one statement
+    await session.exec(delete(models.CartItem).where(models.CartItem.user_id == current_user.id))
 
     order.total = total
     session.add(order)
-    session.commit()
-    session.refresh(order)
+    await session.commit()
+    cache.invalidate_catalog()   # stock levels changed
 
-    return _order_detail(order, session)
+    return ORJSONResponse(await _order_detail(order, session), status_code=status.HTTP_201_CREATED)
 
 
-@router.get("/")
-def list_user_orders(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
-) -> List[Dict[str, Any]]:
+@router.get("/", response_model=None)
+async def list_user_orders(
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
+) -> ORJSONResponse:
     """Return all orders placed by the current user (newest first)."""
-    orders = session.exec(
+    orders = (await session.exec(
         select(models.Order)
         .where(models.Order.user_id == current_user.id)
         .order_by(models.Order.created_at.desc())  # type: ignore[attr-defined]
-    ).all()
-    return [_order_detail(o, session) for o in orders]
+    )).all()
+    return ORJSONResponse(await _order_details(orders, session))
 
 
-@router.get("/{order_id}")
-def get_order(
+@router.get("/{order_id}", response_model=None)
+async def get_order(
     order_id: int,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
-) -> Dict[str, Any]:
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
+) -> ORJSONResponse:
     """Return a single order that belongs to the current user."""
-    order = session.get(models.Order, order_id)
+    order = await session.get(models.Order, order_id)
     if not order or order.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
         )
-    return _order_detail(order, session)
+    return ORJSONResponse(await _order_detail(order, session))
 
 
 # ---------------------------------------------------------------------------
 # Admin routes   (prefix /orders/admin/... to avoid path conflicts)
 # ---------------------------------------------------------------------------
 
-@router.get("/admin/all")
-def list_all_orders(
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
-) -> List[Dict[str, Any]]:
+@router.get("/admin/all", response_model=None)
+async def list_all_orders(
+    _admin: TokenClaims = Depends(require_admin),
+) -> StreamingResponse:
     """Return every order in the system. Admin only."""
-    orders = session.exec(
-        select(models.Order).order_by(models.Order.created_at.desc())  # type: ignore[attr-defined]
-    ).all()
-    return [_order_detail(o, session) for o in orders]
+    return StreamingResponse(_stream_all_orders(), media_type="application/json")
+
+
+async def _stream_all_orders() -> AsyncIterator[bytes]:
+    """
+    Write the admin order list as a JSON array, one chunk of orders at a time.
+
+    Orders are streamed from the DB in partitions and each is hydrated,
+    serialised and sent before the next is read, so memory stays bounded by
+    the chunk size however many orders there are (and the per-chunk IN (...)
+    lookups stay well under bind-parameter limits).  Uses its own session:
+    the body is produced after the request's dependencies have closed theirs.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        result = await session.stream_scalars(
+            select(models.Order)
+            .order_by(models.Order.created_at.desc())  # type: ignore[attr-defined]
+            .execution_options(yield_per=500)
+        )
+        sep = b"["
+        async for chunk in result.partitions():
+            for detail in await _order_details(chunk, session):
+                yield sep + orjson.dumps(detail, option=orjson.OPT_NON_STR_KEYS)
+                sep = b","
+        yield b"[]" if sep == b"[" else b"]"
 
 
-@router.patch("/admin/{order_id}/status")
-def update_order_status(
+@router.patch("/admin/{order_id}/status", response_model=None)
+async def update_order_status(
     order_id: int,
     body: StatusUpdate,
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
-) -> Dict[str, Any]:
+    session: AsyncSession = Depends(get_session),
+    _admin: TokenClaims = Depends(require_admin),
+) -> ORJSONResponse:
     """Update the fulfillment status of an order. Admin only."""
     if body.status not in VALID_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Invalid status. Must be one of: {', '.join(sorted(VALID_STATUSES))}",
         )
-    order = session.get(models.Order, order_id)
+    order = await session.get(models.Order, order_id)
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
         )
     order.status = body.status
     session.add(order)
-    session.commit()
-    session.refresh(order)
-    return _order_detail(order, session)
+    await session.commit()
+    return ORJSONResponse(await _order_detail(order, session))
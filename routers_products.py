@@ -16,163 +16,312 @@ PATCH  /products/{product_id} – partial update
 DELETE /products/{product_id} – delete product
 """
 
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import lambda_stmt, update
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+import cache
 import models
-from auth import require_admin
+from auth import TokenClaims, require_admin
 from database import get_session
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
+# Clients and proxies may reuse a product response this long before
+# revalidating – the same window the in-process catalog cache already allows.
+CACHE_CONTROL = "public, max-age=60"
+
+
+def _counted():
+    """
+    SELECT products together with the unpaginated match count and newest
+    `updated_at` across all matches.
+
+    Both ride along as window columns, so a page, its total and its ETag
+    come back in a single round-trip (see `_listing` / `_page`).
+    """
+    return select(
+        models.Product,
+        func.count().over().label("total"),
+        func.max(models.Product.updated_at).over().label("last_modified"),
+    )
+
+
+def _listing(
+    category: Optional[str],
+    sub: Optional[str],
+    in_stock: Optional[bool],
+    featured: Optional[bool],
+    skip: int,
+    limit: int,
+) -> StatementLambdaElement:
+    """
+    One page of `_counted()` with the given filters (None = not filtered).
+
+    Built as a lambda statement: SQLAlchemy caches the construction and
+    compiled SQL per combination of filters present, so each request only
+    supplies new bind values.
+    """
+    stmt = lambda_stmt(lambda: _counted())
+    if category is not None:
+        stmt += lambda s: s.where(models.Product.category == category)
+    if sub is not None:
+        stmt += lambda s: s.where(models.Product.sub == sub)
+    if in_stock is not None:
+        stmt += lambda s: s.where(models.Product.in_stock == in_stock)
+    if featured is not None:
+        stmt += lambda s: s.where(models.Product.is_featured == featured)
+    stmt += lambda s: s.offset(skip).limit(limit)
+    return stmt
+
+
+async def _page(
+    session: AsyncSession,
+    category: Optional[str],
+    sub: Optional[str],
+    in_stock: Optional[bool],
+    featured: Optional[bool],
+    skip: int,
+    limit: int,
+) -> Tuple[List[models.Product], int, str]:
+    """
+    Run a `_listing()` page; returns (products, total, etag).
+
+    The ETag changes whenever a matching product is added, removed or
+    edited.  A page past the end has no rows to carry the window columns,
+    so the total and ETag then come from a plain aggregate instead.
+    """
+    rows = (await session.exec(
+        _listing(category, sub, in_stock, featured, skip, limit)
+    )).all()
+    if rows:
+        total, last_modified = rows[0][1], rows[0][2]
+        return [r[0] for r in rows], total, _etag(total, last_modified)
+    if not skip:
+        return [], 0, _etag(0, None)
+    P = models.Product
+    stmt = select(func.count(), func.max(P.updated_at))
+    if category is not None:
+        stmt = stmt.where(P.category == category)
+    if sub is not None:
+        stmt = stmt.where(P.sub == sub)
+    if in_stock is not None:
+        stmt = stmt.where(P.in_stock == in_stock)
+    if featured is not None:
+        stmt = stmt.where(P.is_featured == featured)
+    total, last_modified = (await session.exec(stmt)).one()
+    return [], total, _etag(total, last_modified)
+
+
+def _etag(key: object, updated_at: Optional[datetime]) -> str:
+    stamp = 0
+    if updated_at is not None:
+        if updated_at.tzinfo is None:   # SQLite drops the offset; values are UTC
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        stamp = int(updated_at.timestamp() * 1_000_000)
+    return f'W/"{key}-{stamp}"'
+
+
+def _conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Return a bare 304 if the client already holds this version; otherwise tag
+    the outgoing response with the validators and return None.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in {t.strip() for t in inm.split(",")}):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 # ---------------------------------------------------------------------------
 # Public – read
 # ---------------------------------------------------------------------------
 
 @router.get("/search", response_model=List[models.Product])
-def search_products(
+async def search_products(
     q: str = Query(..., min_length=1, description="Search term"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ) -> List[models.Product]:
     """Case-insensitive keyword search across product name and description."""
-    term = f"%{q.lower()}%"
-    results = session.exec(
+    key = q.lower()
+    cached = cache.get("search", key)
+    if cached is not None:
+        return cached
+    # ILIKE is already case-insensitive; on Postgres it is served by the
+    # pg_trgm GIN indexes built in database.init_db().
+    term = f"%{q}%"
+    results = (await session.exec(
         select(models.Product).where(
             models.Product.name.ilike(term)  # type: ignore[attr-defined]
             | models.Product.description.ilike(term)  # type: ignore[attr-defined]
         )
-    ).all()
+    )).all()
+    cache.put("search", key, results)
     return results
 
 
 @router.get("/category/{category}", response_model=List[models.Product])
-def products_by_category(
+async def products_by_category(
     category: str,
+    request: Request,
+    response: Response,
     sub: Optional[str] = Query(None, description="Filter by sub-category"),
     in_stock: Optional[bool] = Query(None),
     featured: Optional[bool] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
-    session: Session = Depends(get_session),
-) -> List[models.Product]:
-    """Return products filtered by category with optional sub-category and stock filters."""
-    stmt = select(models.Product).where(
-        models.Product.category == category
+    session: AsyncSession = Depends(get_session),
+) -> Union[List[models.Product], Response]:
+    """
+    Return products filtered by category with optional sub-category and stock filters.
+
+    The total number of matches (ignoring skip/limit) is sent in `X-Total-Count`;
+    honours `If-None-Match` with a 304.
+    """
+    key = ("category", category, sub, in_stock, featured, skip, limit)
+    cached = cache.get("products", key)
+    if cached is not None:
+        results, total, etag = cached
+        response.headers["X-Total-Count"] = str(total)
+        return _conditional(request, response, etag) or results
+    results, total, etag = await _page(
+        session, category, sub, in_stock, featured, skip, limit
     )
-    if sub is not None:
-        stmt = stmt.where(models.Product.sub == sub)
-    if in_stock is not None:
-        stmt = stmt.where(models.Product.in_stock == in_stock)
-    if featured is not None:
-        stmt = stmt.where(models.Product.is_featured == featured)
-    stmt = stmt.offset(skip).limit(limit)
-    return session.exec(stmt).all()
+    cache.put("products", key, (results, total, etag))
+    response.headers["X-Total-Count"] = str(total)
+    return _conditional(request, response, etag) or results
 
 
 @router.get("/", response_model=List[models.Product])
-def list_products(
+async def list_products(
+    request: Request,
+    response: Response,
     category: Optional[str] = Query(None),
     sub: Optional[str] = Query(None),
     in_stock: Optional[bool] = Query(None),
     featured: Optional[bool] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
-    session: Session = Depends(get_session),
-) -> List[models.Product]:
-    """List all products with optional filtering and pagination."""
-    stmt = select(models.Product)
-    if category is not None:
-        stmt = stmt.where(models.Product.category == category)
-    if sub is not None:
-        stmt = stmt.where(models.Product.sub == sub)
-    if in_stock is not None:
-        stmt = stmt.where(models.Product.in_stock == in_stock)
-    if featured is not None:
-        stmt = stmt.where(models.Product.is_featured == featured)
-    stmt = stmt.offset(skip).limit(limit)
-    return session.exec(stmt).all()
+    session: AsyncSession = Depends(get_session),
+) -> Union[List[models.Product], Response]:
+    """
+    List all products with optional filtering and pagination.
+
+    The total number of matches (ignoring skip/limit) is sent in `X-Total-Count`;
+    honours `If-None-Match` with a 304.
+    """
+    key = ("list", category, sub, in_stock, featured, skip, limit)
+    cached = cache.get("products", key)
+    if cached is not None:
+        results, total, etag = cached
+        response.headers["X-Total-Count"] = str(total)
+        return _conditional(request, response, etag) or results
+    results, total, etag = await _page(
+        session, category, sub, in_stock, featured, skip, limit
+    )
+    cache.put("products", key, (results, total, etag))
+    response.headers["X-Total-Count"] = str(total)
+    return _conditional(request, response, etag) or results
 
 
 @router.get("/{product_id}", response_model=models.Product)
-def get_product(
+async def get_product(
     product_id: int,
-    session: Session = Depends(get_session),
-) -> models.Product:
-    prod = session.get(models.Product, product_id)
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+) -> Union[models.Product, Response]:
+    """Single product; honours `If-None-Match` with a 304."""
+    prod = await cache.get_product(session, product_id)
     if not prod:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return prod
+    return _conditional(request, response, _etag(prod.id, prod.updated_at)) or prod
 
 
 # ---------------------------------------------------------------------------
 # Admin – write
 # ---------------------------------------------------------------------------
 
+async def _update_product(
+    session: AsyncSession, product_id: int, changes: dict
+) -> models.Product:
+    """UPDATE ... RETURNING in one statement – no prior SELECT, no per-field setattr."""
+    prod = (await session.exec(
+        update(models.Product)
+        .where(models.Product.id == product_id)
+        .values(**changes, updated_at=datetime.now(timezone.utc))
+        .returning(models.Product)
+    )).scalars().one_or_none()
+    if prod is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    await session.commit()
+    return prod
+
+
 @router.post("/", response_model=models.Product, status_code=status.HTTP_201_CREATED)
-def create_product(
+async def create_product(
     prod_in: models.ProductCreate,
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+    _admin: TokenClaims = Depends(require_admin),
 ) -> models.Product:
     """Create a new product. Admin only."""
     db_prod = models.Product.from_orm(prod_in)
     session.add(db_prod)
-    session.commit()
-    session.refresh(db_prod)
+    await session.commit()
+    cache.invalidate_catalog()
     return db_prod
 
 
 @router.put("/{product_id}", response_model=models.Product)
-def replace_product(
+async def replace_product(
     product_id: int,
     prod_in: models.ProductCreate,
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+    _admin: TokenClaims = Depends(require_admin),
 ) -> models.Product:
     """Fully replace a product. Admin only."""
-    existing = session.get(models.Product, product_id)
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    # Apply every field from the incoming data
-    for key, val in prod_in.dict().items():
-        setattr(existing, key, val)
-    session.add(existing)
-    session.commit()
-    session.refresh(existing)
+    existing = await _update_product(session, product_id, prod_in.dict())
+    cache.invalidate_catalog()
     return existing
 
 
 @router.patch("/{product_id}", response_model=models.Product)
-def update_product(
+async def update_product(
     product_id: int,
     prod_in: models.ProductUpdate,
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+    _admin: TokenClaims = Depends(require_admin),
 ) -> models.Product:
     """Partially update a product (only send the fields you want to change). Admin only."""
-    existing = session.get(models.Product, product_id)
-    if not existing:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    for key, val in prod_in.dict(exclude_unset=True).items():
-        setattr(existing, key, val)
-    session.add(existing)
-    session.commit()
-    session.refresh(existing)
+    changes = prod_in.dict(exclude_unset=True)
+    if not changes:
+        existing = await session.get(models.Product, product_id)
+        if not existing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        return existing
+    existing = await _update_product(session, product_id, changes)
+    cache.invalidate_catalog()
     return existing
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(
+async def delete_product(
     product_id: int,
-    session: Session = Depends(get_session),
-    _admin: models.User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+    _admin: TokenClaims = Depends(require_admin),
 ) -> None:
     """Delete a product. Admin only."""
-    prod = session.get(models.Product, product_id)
+    prod = await session.get(models.Product, product_id)
     if not prod:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    session.delete(prod)
-    session.commit()
+    await session.delete(prod)
+    await session.commit()
+    cache.invalidate_catalog()
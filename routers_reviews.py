@@ -6,14 +6,18 @@ POST   /reviews/product/{product_id}  – add a review (auth required)
 DELETE /reviews/{id}                  – delete a review (owner or admin)
 """
 
+from datetime import datetime, timezone
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
-from sqlmodel import Session, select
+from sqlalchemy import case, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+import cache
 import models
-from auth import get_current_active_user
+from auth import TokenClaims, get_current_active_user
 from database import get_session
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
@@ -42,19 +46,24 @@ class ReviewOut(BaseModel):
 # ---------------------------------------------------------------------------
 
 @router.get("/product/{product_id}", response_model=List[ReviewOut])
-def get_product_reviews(
+async def get_product_reviews(
     product_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ) -> List[ReviewOut]:
     """Get all reviews for a specific product."""
-    reviews = session.exec(
-        select(models.Review).where(models.Review.product_id == product_id)
-    ).all()
+    cached = cache.get("reviews", product_id)
+    if cached is not None:
+        return cached
+    reviews = (await session.exec(
+        select(models.Review)
+        .where(models.Review.product_id == product_id)
+        .order_by(models.Review.created_at)
+    )).all()
     
     # Enrich with user name
     results = []
     for r in reviews:
-        user = session.get(models.User, r.user_id)
+        user = await session.get(models.User, r.user_id)
         results.append({
             "id": r.id,
             "user_id": r.user_id,
@@ -64,25 +73,39 @@ def get_product_reviews(
             "created_at": r.created_at.isoformat(),
             "user_name": user.full_name if user else "Anonymous"
         })
+    cache.put("reviews", product_id, results)
     return results
 
 
 @router.post("/product/{product_id}", response_model=models.Review, status_code=status.HTTP_201_CREATED)
-def create_review(
+async def create_review(
     product_id: int,
     review_in: ReviewCreate,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
 ) -> models.Review:
     """Add a review for a product."""
-    # Check if product exists
-    product = session.get(models.Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
     # Check if user already reviewed? Typically allowed multiple, or restrict one per user?
     # Let's allow multiple for now as per simple requirements.
 
+    # Fold the new rating into the running average (O(1), no re-scan of every
+    # review).  The arithmetic runs in SQL against the current row, so
+    # concurrent reviews can't overwrite each other's counts; no row updated
+    # means the product doesn't exist.
+    P = models.Product
+    result = await session.exec(
+        update(P)
+        .where(P.id == product_id)
+        .values(
+            rating=(P.rating * P.review_count + review_in.rating) / (P.review_count + 1),
+            review_count=P.review_count + 1,
+            updated_at=datetime.now(timezone.utc),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Product not found")
+
     review = models.Review(
         product_id=product_id,
         user_id=current_user.id,
@@ -90,54 +113,47 @@ def create_review(
         comment=review_in.comment
     )
     session.add(review)
-    session.commit()
-    session.refresh(review)
-    
-    # Update product rating and review count
-    # This is a bit heavy for every review, but keeps data consistent.
-    # Recalculate average
-    all_reviews = session.exec(
-        select(models.Review).where(models.Review.product_id == product_id)
-    ).all()
-    
-    total_rating = sum(r.rating for r in all_reviews)
-    count = len(all_reviews)
-    
-    product.rating = total_rating / count if count > 0 else 0
-    product.review_count = count
-    session.add(product)
-    session.commit()
-    
+    await session.commit()   # review and rating change land together
+    cache.invalidate_catalog()   # product rating and review list changed
+
     return review
 
 
 @router.delete("/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_review(
+async def delete_review(
     review_id: int,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_session),
+    current_user: TokenClaims = Depends(get_current_active_user),
 ) -> None:
     """Delete a review. Only the author or an admin can delete it."""
-    review = session.get(models.Review, review_id)
+    review = await session.get(models.Review, review_id)
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
         
     if review.user_id != current_user.id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to delete this review")
         
-    product_id = review.product_id
-    session.delete(review)
-    session.commit()
-    
-    # Update product stats again
-    product = session.get(models.Product, product_id)
-    if product:
-        remaining_reviews = session.exec(
-            select(models.Review).where(models.Review.product_id == product_id)
-        ).all()
-        total_rating = sum(r.rating for r in remaining_reviews)
-        count = len(remaining_reviews)
-        product.rating = total_rating / count if count > 0 else 0
-        product.review_count = count
-        session.add(product)
-        session.commit()
+    await session.delete(review)
+
+    # Remove this rating from the running average in the same transaction,
+    # again computed in SQL from the current row.  Clamped so float drift
+    # can't leave the 0–5 range; the last review resets the product to 0.
+    P = models.Product
+    remaining_avg = (P.rating * P.review_count - review.rating) / (P.review_count - 1)
+    await session.exec(
+        update(P)
+        .where(P.id == review.product_id)
+        .values(
+            rating=case(
+                (P.review_count <= 1, 0.0),
+                (remaining_avg < 0, 0.0),
+                (remaining_avg > 5, 5.0),
+                else_=remaining_avg,
+            ),
+            review_count=case((P.review_count > 0, P.review_count - 1), else_=0),
+            updated_at=datetime.now(timezone.utc),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    cache.invalidate_catalog()
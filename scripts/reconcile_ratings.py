@@ -0,0 +1,94 @@
+"""
+scripts/reconcile_ratings.py
+----------------------------
+Recomputes Product.rating / Product.review_count from the Review table.
+
+The review endpoints keep both columns as a running average, updated in SQL
+on every create/delete.  That is exact for the count, but the average picks
+up float rounding over many updates (and any out-of-band edit to the review
+table bypasses it entirely), so run this periodically – e.g. a nightly cron –
+to pull drifted rows back to the true values.
+
+Note the demo catalogue from scripts/seed.py ships ratings with no backing
+reviews; reconciling resets those products to 0 stars / 0 reviews.
+
+Usage (from the jewellery_backend root):
+    python -m scripts.reconcile_ratings        (or: python scripts/reconcile_ratings.py)
+
+Options:
+    --dry-run   Report how many products have drifted without fixing them
+"""
+
+import sys
+import os
+import argparse
+
+# Make sure the project root is on the path so we can import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Drift below this is float noise from the running average, not worth a write.
+TOLERANCE = 1e-6
+
+
+def reconcile(dry_run: bool = False) -> int:
+    """Fix every product whose rating/review_count disagrees with its reviews.
+
+    Returns the number of drifted products.
+    """
+    from datetime import datetime, timezone
+
+    from sqlalchemy import func, or_, select, update
+
+    import models
+    from database import engine
+
+    P, R = models.Product, models.Review
+    true_count = (
+        select(func.count()).where(R.product_id == P.id).scalar_subquery()
+    )
+    true_rating = (
+        select(func.coalesce(func.avg(R.rating), 0.0))
+        .where(R.product_id == P.id)
+        .scalar_subquery()
+    )
+    drifted = or_(
+        P.review_count != true_count,
+        func.abs(P.rating - true_rating) > TOLERANCE,
+    )
+
+    # One set-based statement: the recount runs inside the UPDATE itself, so
+    # there's no read-then-write window for a concurrent review to fall into.
+    with engine.begin() as conn:
+        if dry_run:
+            fixed = conn.execute(select(func.count()).where(drifted)).scalar_one()
+        else:
+            fixed = conn.execute(
+                update(P)
+                .where(drifted)
+                .values(
+                    rating=true_rating,
+                    review_count=true_count,
+                    updated_at=datetime.now(timezone.utc),
+                )
+            ).rowcount
+
+    # Running API workers pick the new values up when their catalogue cache
+    # entries expire.
+    return fixed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile product ratings with their reviews")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report drifted products, don't update them",
+    )
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    n = reconcile(dry_run=args.dry_run)
+    verb = "drifted" if args.dry_run else "reconciled"
+    sys.stdout.write(f"✅ {n} product(s) {verb}.\n")
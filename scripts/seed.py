@@ -4,217 +4,75 @@ scripts/seed.py
 Populates the SQLite database with demo products and an admin user.
 
 Usage (from the jewellery_backend root):
-    python scripts/seed.py
+    python -m scripts.seed        (or: python scripts/seed.py)
+
+The API only seeds on startup when RUN_SEED=1, so run this once per
+environment instead.
 
 Options:
-    --reset   Drop and recreate every row before seeding  (default: skip if data exists)
+    --reset   Delete every row before seeding  (default: skip if data exists)
 """
 
 import sys
 import os
 import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, TypedDict
 
 # Make sure the project root is on the path so we can import modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from dotenv import load_dotenv
-load_dotenv()
-
-from sqlmodel import Session, select
-from database import engine, init_db
-from auth import get_password_hash
-import models
+# Everything heavier (SQLModel, the engine, bcrypt, dotenv) is imported where
+# it's used, so `--help` and plain imports of this module return instantly.
 
 
 # ---------------------------------------------------------------------------
 # Seed data
 # ---------------------------------------------------------------------------
 
-PRODUCTS = [
-    # ── Rings ──────────────────────────────────────────────────────────────
-    models.ProductCreate(
-        name="Solitaire Diamond Ring",
-        price=28000, original_price=32000, discount=12.5,
-        category="rings", sub="solitaire",
-        description="Stunning solitaire diamond ring with certified diamond stone",
-        image="/images/rings.jpg",
-        images=["/images/rings.jpg", "/images/rings-2.jpg"],
-        rating=4.8, review_count=245,
-        in_stock=True, stock_quantity=15, is_featured=True,
-        highlights=["100% Certified", "Hallmarked Gold", "Lifetime Warranty"],
-        features=["Free Shipping", "Easy Returns", "30-Day Exchange"],
-    ),
-    models.ProductCreate(
-        name="Halo Diamond Ring",
-        price=32000, original_price=38000, discount=15.8,
-        category="rings", sub="halo",
-        description="Elegant halo diamond ring with surrounding diamonds",
-        image="/images/rings.jpg",
-        images=["/images/rings.jpg", "/images/rings-2.jpg"],
-        rating=4.7, review_count=189,
-        in_stock=True, stock_quantity=10, is_featured=True,
-        highlights=["100% Certified", "22K Gold", "BIS Hallmarked"],
-    ),
-    models.ProductCreate(
-        name="Stackable Gold Ring Set",
-        price=9500, original_price=11000, discount=13.6,
-        category="rings", sub="stackable",
-        description="Beautiful set of 3 stackable gold rings for everyday wear",
-        image="/images/rings.jpg",
-        images=["/images/rings.jpg"],
-        rating=4.5, review_count=412,
-        in_stock=True, stock_quantity=50,
-        highlights=["Light Weight", "Daily Wear", "Elegant Design"],
-    ),
-    models.ProductCreate(
-        name="Twisted Band Ring",
-        price=6500, original_price=7800, discount=16.7,
-        category="rings", sub="band",
-        description="Minimalist twisted gold band ring for everyday elegance",
-        image="/images/rings.jpg",
-        images=["/images/rings.jpg"],
-        rating=4.3, review_count=98,
-        in_stock=True, stock_quantity=30,
-        highlights=["18K Gold", "Minimalist", "Unisex"],
-    ),
-    # ── Necklaces ───────────────────────────────────────────────────────────
-    models.ProductCreate(
-        name="Gold Pendant Necklace",
-        price=21000, original_price=24000, discount=12.5,
-        category="necklaces", sub="pendant",
-        description="Classic gold pendant necklace with intricate filigree design",
-        image="/images/necklaces.jpg",
-        images=["/images/necklaces.jpg", "/images/necklaces-2.jpg"],
-        rating=4.6, review_count=334,
-        in_stock=True, stock_quantity=20, is_featured=True,
-        highlights=["22K Gold", "Lightweight", "Adjustable Chain"],
-    ),
-    models.ProductCreate(
-        name="Velvet Choker Necklace",
-        price=26000, original_price=30000, discount=13.3,
-        category="necklaces", sub="choker",
-        description="Luxurious velvet choker with diamond accent",
-        image="/images/necklaces.jpg",
-        images=["/images/necklaces.jpg"],
-        rating=4.9, review_count=156,
-        in_stock=True, stock_quantity=12,
-        highlights=["Premium Velvet", "Diamond Accent", "Party Wear"],
-    ),
-    models.ProductCreate(
-        name="Temple Gold Necklace",
-        price=42000, original_price=48000, discount=12.5,
-        category="necklaces", sub="temple",
-        description="Traditional temple-style gold necklace with ruby accents",
-        image="/images/necklaces.jpg",
-        images=["/images/necklaces.jpg"],
-        rating=4.8, review_count=201,
-        in_stock=True, stock_quantity=8, is_featured=True,
-        highlights=["Traditional Design", "Ruby Accents", "22K Gold"],
-    ),
-    # ── Anklets ─────────────────────────────────────────────────────────────
-    models.ProductCreate(
-        name="Classic Gold Anklet",
-        price=7000, original_price=8000, discount=12.5,
-        category="anklets", sub="gold",
-        description="Elegant classic gold anklet for everyday styling",
-        image="/images/anklets.jpg",
-        images=["/images/anklets.jpg"],
-        rating=4.4, review_count=289,
-        in_stock=True, stock_quantity=40,
-        highlights=["18K Gold", "Durable", "Free Size"],
-    ),
-    models.ProductCreate(
-        name="Beaded Silver Anklet",
-        price=3500, original_price=4200, discount=16.7,
-        category="anklets", sub="silver",
-        description="Delicate beaded silver anklet with charm",
-        image="/images/anklets.jpg",
-        images=["/images/anklets.jpg"],
-        rating=4.2, review_count=175,
-        in_stock=True, stock_quantity=60,
-        highlights=["92.5 Silver", "Lightweight", "Beach Wear"],
-    ),
-    # ── Bangles ─────────────────────────────────────────────────────────────
-    models.ProductCreate(
-        name="Traditional Kada Bangle",
-        price=15000, original_price=18000, discount=16.7,
-        category="bangles", sub="kada",
-        description="Traditional thick gold kada bangle for festivals",
-        image="/images/bangles.jpg",
-        images=["/images/bangles.jpg", "/images/bangles-2.jpg"],
-        rating=4.7, review_count=223,
-        in_stock=True, stock_quantity=25, is_featured=True,
-        highlights=["22K Gold", "Traditional Design", "Auspicious"],
-    ),
-    models.ProductCreate(
-        name="Kundan Bangle Set",
-        price=12000, original_price=14500, discount=17.2,
-        category="bangles", sub="kundan",
-        description="Exquisite kundan work bangle set of 4 pieces",
-        image="/images/bangles.jpg",
-        images=["/images/bangles.jpg"],
-        rating=4.6, review_count=118,
-        in_stock=True, stock_quantity=20,
-        highlights=["Kundan Work", "Bridal Wear", "Set of 4"],
-    ),
-    # ── Earrings ────────────────────────────────────────────────────────────
-    models.ProductCreate(
-        name="Diamond Stud Earrings",
-        price=15000, original_price=18000, discount=16.7,
-        category="earrings", sub="studs",
-        description="Elegant certified diamond stud earrings",
-        image="/images/earrings.jpg",
-        images=["/images/earrings.jpg", "/images/earrings-2.jpg"],
-        rating=4.8, review_count=389,
-        in_stock=True, stock_quantity=18, is_featured=True,
-        highlights=["Certified Diamonds", "Screw Back", "All Occasion"],
-    ),
-    models.ProductCreate(
-        name="Jhumka Drop Earrings",
-        price=8500, original_price=10000, discount=15.0,
-        category="earrings", sub="jhumka",
-        description="Traditional gold jhumka earrings with pearl drops",
-        image="/images/earrings.jpg",
-        images=["/images/earrings.jpg"],
-        rating=4.5, review_count=267,
-        in_stock=True, stock_quantity=35,
-        highlights=["Pearl Drops", "Traditional", "Lightweight"],
-    ),
-    models.ProductCreate(
-        name="Hoop Earrings",
-        price=5500, original_price=6500, discount=15.4,
-        category="earrings", sub="hoops",
-        description="Modern gold hoop earrings for everyday glam",
-        image="/images/earrings.jpg",
-        images=["/images/earrings.jpg"],
-        rating=4.3, review_count=312,
-        in_stock=True, stock_quantity=45,
-        highlights=["18K Gold", "Modern", "Lightweight"],
-    ),
-    # ── Chains ──────────────────────────────────────────────────────────────
-    models.ProductCreate(
-        name="Figaro Gold Chain",
-        price=18000, original_price=21000, discount=14.3,
-        category="chains", sub="figaro",
-        description="Classic Figaro pattern gold chain, perfect for pendants",
-        image="/images/chains.jpg",
-        images=["/images/chains.jpg"],
-        rating=4.5, review_count=143,
-        in_stock=True, stock_quantity=22,
-        highlights=["22K Gold", "Hallmarked", "Unisex"],
-    ),
-    models.ProductCreate(
-        name="Box Chain Necklace",
-        price=14000, original_price=17000, discount=17.6,
-        category="chains", sub="box",
-        description="Sleek box-link gold chain for a minimalist look",
-        image="/images/chains.jpg",
-        images=["/images/chains.jpg"],
-        rating=4.4, review_count=89,
-        in_stock=True, stock_quantity=28,
-        highlights=["18K Gold", "Minimalist", "Durable"],
-    ),
-]
+class ProductSeed(TypedDict):
+    """One row of seed_data/products.json – every Product column, spelled out."""
+    name: str
+    price: float
+    original_price: Optional[float]
+    discount: Optional[float]
+    category: Optional[str]
+    sub: Optional[str]
+    description: Optional[str]
+    image: Optional[str]
+    images: Optional[List[str]]
+    highlights: Optional[List[str]]
+    features: Optional[List[str]]
+    rating: float
+    review_count: int
+    in_stock: bool
+    stock_quantity: int
+    is_featured: bool
+
+
+# Uniform keys on every row keep the bulk insert a single statement shape.
+PRODUCTS_FILE = Path(__file__).with_name("seed_data") / "products.json"
+
+
+@lru_cache(maxsize=None)
+def product_rows() -> Tuple[ProductSeed, ...]:
+    """Rows of the seed catalogue, read from PRODUCTS_FILE once per process."""
+    import orjson
+
+    rows: Tuple[ProductSeed, ...] = tuple(orjson.loads(PRODUCTS_FILE.read_bytes()))
+    if __debug__:
+        # Catch a bad hand edit to the JSON before it reaches the database
+        # (skipped under `python -O`): a plain key check on every row, and a
+        # full Pydantic validation of the first as a cheap smoke check.
+        import models
+
+        for row in rows:
+            assert row.keys() == ProductSeed.__annotations__.keys(), row.get("name")
+        if rows:
+            models.ProductCreate.model_validate(rows[0])
+    return rows
+
 
 ADMIN_EMAIL = "admin@aureliajewels.com"
 ADMIN_PASSWORD = "Admin@1234"   # Change after first login!
@@ -222,73 +80,153 @@ ADMIN_PASSWORD = "Admin@1234"   # Change after first login!
 DEMO_EMAIL = "demo@aureliajewels.com"
 DEMO_PASSWORD = "Demo@1234"
 
+# bcrypt hashes (cost 10) of the two constant passwords above, precomputed so
+# seeding doesn't spend ~100 ms of CPU per user.  If BCRYPT_ROUNDS differs,
+# login rehashes them at the configured cost.  Regenerate both if a password
+# changes – the __main__ check below catches a mismatch.
+ADMIN_PW_HASH = "$2b$10$f54eDNzR.p1NH/nEYjdgf.5wQc0C.pURIgNgBK03zIehPj9aHnx6y"
+DEMO_PW_HASH = "$2b$10$Dpjdp0mD5lxDoEChk.LoUuWOvXX0R9cjcR0IAbtcS3tctYE9fxj9u"
+
+USER_ROWS = (
+    {
+        "email": ADMIN_EMAIL,
+        "hashed_password": ADMIN_PW_HASH,
+        "full_name": "Aurelia Admin",
+        "is_admin": True,
+        "is_active": True,
+    },
+    {
+        "email": DEMO_EMAIL,
+        "hashed_password": DEMO_PW_HASH,
+        "full_name": "Demo Customer",
+        "is_admin": False,
+        "is_active": True,
+    },
+)
+
 
 # ---------------------------------------------------------------------------
 # Seed logic
 # ---------------------------------------------------------------------------
 
-def seed(reset: bool = False) -> None:
-    if reset:
-        print("🗑️  Dropping and recreating all tables…")
-        from sqlmodel import SQLModel
-        SQLModel.metadata.drop_all(engine)
-        SQLModel.metadata.create_all(engine)
-        print("✅ Tables recreated.")
-    else:
-        init_db()   # create tables if they don't exist yet
+# Lowest SQLITE_MAX_VARIABLE_NUMBER in the wild (builds before 3.32)
+MAX_BIND_PARAMS = 999
+
+
+@lru_cache(maxsize=None)
+def _inserts(dialect: str) -> Tuple[Any, Any]:
+    """
+    The (product, user) INSERT statements, built once per process.
+
+    Reusing the same objects lets SQLAlchemy hit its compiled-statement cache
+    without rebuilding the construct on every seed() call.
+    """
+    from sqlalchemy import insert
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    import models
+
+    # INSERT ... ON CONFLICT (email) DO NOTHING – no read-before-write; the
+    # unique ix_user_email index decides whether a user already exists, and
+    # RETURNING reports which ones were new.
+    user_insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    return (
+        insert(models.Product),
+        user_insert(models.User)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(models.User.email),
+    )
 
-    with Session(engine) as session:
+
+def seed(reset: bool = False) -> None:
+    from sqlalchemy import exists
+    from sqlmodel import Session, SQLModel, select
+
+    import models
+    from database import engine, init_db
+
+    init_db()   # create tables / columns / indexes if they don't exist yet
+    # Collected and written once at the end, after the commit, so the report
+    # never claims rows that a failed run rolled back.
+    msgs: List[str] = []
+    product_insert, users_insert = _inserts(engine.dialect.name)
+
+    # One transaction for everything: a single commit (and fsync) instead of
+    # one per block, and a failed run leaves nothing half-seeded.
+    with Session(engine) as session, session.begin():
+        if engine.dialect.name == "sqlite":
+            # pysqlite only opens a transaction in front of INSERT/UPDATE/
+            # DELETE, leaving DDL (the index drop/create below) in autocommit.
+            # Start it explicitly so everything here commits or rolls back
+            # together; IMMEDIATE also takes the write lock up front.
+            session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        if reset:
+            # DELETE rather than drop_all/create_all: no DDL, indexes stay in
+            # place, and it rolls back with the rest if seeding fails.
+            # Children first so foreign keys are never violated.
+            for table in reversed(SQLModel.metadata.sorted_tables):
+                session.exec(table.delete())
+            msgs.append("🗑️  Cleared all tables.")
 
         # ── Products ─────────────────────────────────────────────────────
-        existing_product = session.exec(select(models.Product)).first()
-        if existing_product and not reset:
-            print(f"⏭️  Products already seeded – skipping (use --reset to re-seed).")
+        has_products = session.exec(select(exists().select_from(models.Product))).one()
+        seeded_products = reset or not has_products
+        if not seeded_products:
+            msgs.append(f"⏭️  Products already seeded – skipping (use --reset to re-seed).")
         else:
-            for p in PRODUCTS:
-                db_prod = models.Product.from_orm(p)
-                session.add(db_prod)
-            session.commit()
-            print(f"✅ Seeded {len(PRODUCTS)} products.")
-
-        # ── Admin user ───────────────────────────────────────────────────
-        admin = session.exec(
-            select(models.User).where(models.User.email == ADMIN_EMAIL)
-        ).first()
-        if admin and not reset:
-            print(f"⏭️  Admin user already exists – skipping.")
+            # Multi-row INSERT ... VALUES (...), (...), … – one statement per
+            # chunk, sized to stay under SQLite's classic 999 bind-parameter
+            # cap (every table column counts as one parameter per row, which
+            # also covers defaults such as updated_at).
+            rows = product_rows()
+            table = models.Product.__table__
+            per_stmt = MAX_BIND_PARAMS // len(table.columns)
+
+            # The table is empty here, so build its secondary indexes once
+            # after the load instead of updating every B-tree row by row.
+            # The DDL runs inside the seed transaction (see BEGIN IMMEDIATE
+            # above for SQLite), so a failed seed rolls back to the indexed
+            # (empty) table.
+            conn = session.connection()
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+            for i in range(0, len(rows), per_stmt):
+                session.exec(product_insert.values(rows[i:i + per_stmt]))
+            for index in table.indexes:
+                index.create(conn)
+            msgs.append(f"✅ Seeded {len(rows)} products.")
+
+        # ── Users ────────────────────────────────────────────────────────
+        # Both users in one executemany
+        created = set(session.exec(users_insert, params=USER_ROWS).scalars())
+
+        if ADMIN_EMAIL not in created:
+            msgs.append(f"⏭️  Admin user already exists – skipping.")
         else:
-            admin = models.User(
-                email=ADMIN_EMAIL,
-                hashed_password=get_password_hash(ADMIN_PASSWORD),
-                full_name="Aurelia Admin",
-                is_admin=True,
-                is_active=True,
-            )
-            session.add(admin)
-            session.commit()
-            print(f"✅ Created admin user → {ADMIN_EMAIL}")
-            print(f"   Password: {ADMIN_PASSWORD}  ← change this after first login!")
-
-        # ── Demo / regular user ──────────────────────────────────────────
-        demo = session.exec(
-            select(models.User).where(models.User.email == DEMO_EMAIL)
-        ).first()
-        if demo and not reset:
-            print(f"⏭️  Demo user already exists – skipping.")
+            msgs.append(f"✅ Created admin user → {ADMIN_EMAIL}")
+            msgs.append(f"   Password: {ADMIN_PASSWORD}  ← change this after first login!")
+
+        if DEMO_EMAIL not in created:
+            msgs.append(f"⏭️  Demo user already exists – skipping.")
         else:
-            demo = models.User(
-                email=DEMO_EMAIL,
-                hashed_password=get_password_hash(DEMO_PASSWORD),
-                full_name="Demo Customer",
-                is_admin=False,
-                is_active=True,
-            )
-            session.add(demo)
-            session.commit()
-            print(f"✅ Created demo user  → {DEMO_EMAIL}")
-            print(f"   Password: {DEMO_PASSWORD}")
+            msgs.append(f"✅ Created demo user  → {DEMO_EMAIL}")
+            msgs.append(f"   Password: {DEMO_PASSWORD}")
 
-    print("\n✨ Database seeded successfully!")
+    # Refresh planner statistics now that the tables have data, so the app's
+    # first queries already pick the email / category indexes.  On SQLite
+    # also fold the insert burst back out of the WAL file.  Only after a run
+    # that actually wrote rows: a no-op seed (e.g. RUN_SEED=1 on every boot)
+    # shouldn't pay for a database-wide ANALYZE.
+    if seeded_products or created:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE")
+            if engine.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA optimize")
+                conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    msgs.append("\n✨ Database seeded successfully!")
+    sys.stdout.write("\n".join(msgs) + "\n")
 
 
 if __name__ == "__main__":
@@ -299,4 +237,11 @@ if __name__ == "__main__":
         help="Clear all existing data before seeding",
     )
     args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from auth import verify_password
+
+    assert verify_password(ADMIN_PASSWORD, ADMIN_PW_HASH), "ADMIN_PW_HASH is stale"
+    assert verify_password(DEMO_PASSWORD, DEMO_PW_HASH), "DEMO_PW_HASH is stale"
     seed(reset=args.reset)